@@ -1,23 +1,40 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
 import mlflow
-import mlflow.keras
 from mlflow.tracking import MlflowClient
 import numpy as np
 import os
 import time
+from shared_model import SharedModelReader, SharedModelFallback
+from formats import FormatError, decode_features, encode_predictions, normalize_media_type, negotiate_response_type, JSON, NDJSON, SUPPORTED_MEDIA_TYPES
+from streaming import DuplexStreamingResponse, iter_feature_chunks, encode_chunk, encode_error, encode_end, STREAMING_MEDIA_TYPES
 
 app = FastAPI(title="Wine Quality Prediction API")
 
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000")
 MODEL_NAME = os.getenv("MODEL_NAME", "wine-quality-model")
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1024"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "4096"))
+# "single" : un process qui charge son modèle Keras ; "shared" : workers gunicorn + poids partagés (voir gunicorn.conf.py)
+SERVING_MODE = os.getenv("SERVING_MODE", "single")
 mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
 
-client = MlflowClient()
+# En mode partagé, seul le coordinateur interroge MLflow : pas de client dans les workers
+client = MlflowClient() if SERVING_MODE == "single" else None
 
 model = None
 current_model_version = None
+shared_model_reader = SharedModelReader() if SERVING_MODE == "shared" else None
+fallback_reason = None
+
+
+def load_keras_model(model_uri):
+    """Charger un modèle Keras depuis MLflow (mlflow.keras, donc TensorFlow, importé seulement en mode single)"""
+    import mlflow.keras
+    return mlflow.keras.load_model(model_uri)
 
 
 def get_latest_model_version():
@@ -45,6 +62,16 @@ async def load_model():
     max_retries = 5
     retry_delay = 5  
     
+    if SERVING_MODE == "shared":
+        # Le coordinateur publie le modèle, le worker attend simplement sa publication
+        for attempt in range(max_retries):
+            if refresh_shared_model():
+                return
+            print(f"Tentative {attempt + 1}/{max_retries} : modèle partagé pas encore publié...")
+            time.sleep(retry_delay)
+        print("ℹ Le worker démarrera sans modèle.")
+        return
+    
     # Réessayer plusieurs fois (au cas où MLflow n'est pas encore prêt)
     for attempt in range(max_retries):
         try:
@@ -64,7 +91,7 @@ async def load_model():
             
             # Charger le modèle depuis MLflow
             model_uri = f"models:/{MODEL_NAME}/{latest_version}"
-            model = mlflow.keras.load_model(model_uri)
+            model = load_keras_model(model_uri)
             
             current_model_version = latest_version
             print(f"✓ Modèle chargé avec succès (version {latest_version})")
@@ -79,10 +106,45 @@ async def load_model():
                 print("⚠ L'API démarrera sans modèle.")
 
 
+def refresh_shared_model():
+    """Mode partagé : basculer vers la dernière version publiée par le coordinateur (sans appel à MLflow)"""
+    global model, current_model_version
+
+    try:
+        published = shared_model_reader.refresh()
+    except SharedModelFallback as e:
+        return switch_to_single_mode(str(e))
+    except Exception as e:
+        print(f"✗ Erreur lors du chargement du modèle partagé: {e}")
+        return False
+
+    if published is None:
+        return False
+
+    model, current_model_version = published
+    print(f"✓ Modèle partagé chargé (version {current_model_version})")
+    return True
+
+
+def switch_to_single_mode(reason):
+    """Le modèle ne peut pas être servi depuis la mémoire partagée : chaque worker charge son propre modèle Keras"""
+    global SERVING_MODE, client, fallback_reason
+
+    print(f"✗ MODE PARTAGÉ IMPOSSIBLE : {reason}")
+    print("✗ Bascule du worker en mode single : chargement du modèle Keras (TensorFlow) dans ce process.")
+    SERVING_MODE = "single"
+    fallback_reason = reason
+    client = MlflowClient()
+    return check_for_model_update()
+
+
 def check_for_model_update():
     """Vérifie si une nouvelle version du modèle est disponible et la charge automatiquement"""
     global model, current_model_version
 
+    if SERVING_MODE == "shared":
+        return refresh_shared_model()
+
     latest_version = get_latest_model_version()
     
     if latest_version is None:
@@ -92,7 +154,7 @@ def check_for_model_update():
     if current_model_version is None or latest_version != current_model_version:
         try:
             model_uri = f"models:/{MODEL_NAME}/{latest_version}"
-            model = mlflow.keras.load_model(model_uri)
+            model = load_keras_model(model_uri)
             current_model_version = latest_version
             print(f"✓ Modèle mis à jour vers la version {latest_version}")
             return True
@@ -135,7 +197,10 @@ def health_check():
         "status": "healthy",
         "model_loaded": model is not None,
         "model_name": MODEL_NAME,
-        "model_version": current_model_version
+        "model_version": current_model_version,
+        "serving_mode": SERVING_MODE,
+        "fallback_reason": fallback_reason,
+        "pid": os.getpid()
     }
 
 
@@ -145,6 +210,17 @@ def model_info():
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
+    if SERVING_MODE == "shared":
+        # Métadonnées publiées par le coordinateur avec le modèle (pas d'appel à MLflow depuis les workers)
+        pointer = shared_model_reader.pointer
+        return {
+            "model_name": MODEL_NAME,
+            "version": current_model_version,
+            "run_id": pointer.get("run_id"),
+            "status": pointer.get("status"),
+            "creation_timestamp": pointer.get("creation_timestamp")
+        }
+    
     try:
         # Récupérer les métadonnées du modèle depuis MLflow
         model_version_details = client.get_model_version(
@@ -166,6 +242,10 @@ def model_info():
 @app.post("/predict")
 def predict(features: WineFeatures):
     """Prédire la qualité du vin à partir de ses caractéristiques"""
+    if model is None and SERVING_MODE == "shared":
+        # Le modèle a pu être publié après le démarrage du worker
+        refresh_shared_model()
+
     if model is None:
         raise HTTPException(
             status_code=503,
@@ -205,11 +285,112 @@ def predict(features: WineFeatures):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """Prédire la qualité d'un lot de vins (JSON, Arrow IPC, msgpack ou .npy selon le Content-Type)"""
+    if model is None and SERVING_MODE == "shared":
+        # Le modèle a pu être publié après le démarrage du worker
+        refresh_shared_model()
+
+    if model is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model '{MODEL_NAME}' not loaded. Please train and register a model first."
+        )
+
+    request_type = normalize_media_type(request.headers.get("content-type")) or JSON
+    response_type = negotiate_response_type(request.headers.get("accept"), request_type)
+
+    try:
+        # Décodage direct en matrice float32 contiguë (pas d'objet Pydantic par ligne),
+        # hors de la boucle d'événements : il est coûteux en CPU pour les gros lots
+        body = await request.body()
+        input_data = await run_in_threadpool(decode_features, body, request_type)
+    except FormatError as e:
+        status_code = 415 if request_type not in SUPPORTED_MEDIA_TYPES else 422
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+    try:
+        updated = await run_in_threadpool(check_for_model_update)
+        prediction = await run_in_threadpool(model.predict, input_data, batch_size=BATCH_SIZE, verbose=0)
+
+        metadata = {
+            "model_updated": updated,
+            "model_version": current_model_version,
+            "model_name": MODEL_NAME,
+            "count": len(input_data)
+        }
+        content = await run_in_threadpool(encode_predictions, prediction, response_type, metadata)
+        return Response(content=content, media_type=response_type, headers={"X-Model-Version": str(current_model_version)})
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """Prédire la qualité d'un fichier NDJSON ou CSV en flux : lecture, inférence par blocs et réponse chunkée,
+    avec une mémoire constante quelle que soit la taille du fichier"""
+    if model is None and SERVING_MODE == "shared":
+        # Le modèle a pu être publié après le démarrage du worker
+        refresh_shared_model()
+
+    if model is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model '{MODEL_NAME}' not loaded. Please train and register a model first."
+        )
+
+    media_type = normalize_media_type(request.headers.get("content-type")) or NDJSON
+    if media_type not in STREAMING_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported media type '{media_type}'. Supported: {STREAMING_MEDIA_TYPES}"
+        )
+
+    await run_in_threadpool(check_for_model_update)
+    # Le même modèle sert tout le flux, même si une nouvelle version est chargée entre-temps
+    stream_model, stream_version = model, current_model_version
+
+    async def predictions():
+        first = True
+        count = 0
+        try:
+            async for input_data in iter_feature_chunks(request.stream(), media_type, STREAM_CHUNK_SIZE):
+                prediction = await run_in_threadpool(stream_model.predict, input_data, batch_size=BATCH_SIZE, verbose=0)
+                yield encode_chunk(prediction, media_type, first)
+                first = False
+                count += len(input_data)
+        except ClientDisconnect:
+            return
+        except Exception as e:
+            # Les en-têtes sont déjà envoyés : l'erreur est signalée dans le flux
+            yield encode_error(str(e), media_type, count)
+            return
+        yield encode_end(media_type, count)
+
+    return DuplexStreamingResponse(
+        predictions(),
+        media_type=media_type,
+        headers={"X-Model-Version": str(stream_version)}
+    )
+
+
 @app.post("/model/reload")
 def reload_model():
     """Forcer le rechargement manuel du modèle depuis MLflow"""
     global model, current_model_version
     
+    if SERVING_MODE == "shared":
+        # Seul le coordinateur interroge MLflow : le worker relit la dernière version publiée
+        refresh_shared_model()
+        if model is None:
+            raise HTTPException(status_code=404, detail=f"No model '{MODEL_NAME}' published yet")
+        return {
+            "message": "Model reloaded successfully",
+            "model_version": current_model_version
+        }
+    
     try:
         latest_version = get_latest_model_version()
         
@@ -218,7 +399,7 @@ def reload_model():
         
         # Charger la dernière version
         model_uri = f"models:/{MODEL_NAME}/{latest_version}"
-        model = mlflow.keras.load_model(model_uri)
+        model = load_keras_model(model_uri)
         current_model_version = latest_version
         
         return {
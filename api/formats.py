@@ -0,0 +1,249 @@
+"""Décodage/encodage des formats de scoring en masse (JSON, Arrow IPC, msgpack, .npy)"""
+import io
+import numpy as np
+import orjson
+import msgpack
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Ordre des features attendu par le modèle (type encodé : red=0, white=1)
+FEATURE_COLUMNS = [
+    "type",
+    "fixed_acidity", "volatile_acidity",
+    "citric_acid", "residual_sugar",
+    "chlorides", "free_sulfur_dioxide",
+    "total_sulfur_dioxide", "density",
+    "pH", "sulphates", "alcohol"
+]
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+MSGPACK = "application/msgpack"
+NPY = "application/x-npy"
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/octet-stream": NPY,
+    "application/jsonl": NDJSON,
+    "application/ndjson": NDJSON,
+}
+
+SUPPORTED_MEDIA_TYPES = [JSON, ARROW, ARROW_FILE, MSGPACK, NPY]
+
+
+class FormatError(ValueError):
+    """Corps de requête invalide (format ou schéma)"""
+
+
+def normalize_media_type(content_type):
+    """Extraire le media type sans paramètres (ex: '; charset=utf-8') et résoudre les alias"""
+    if not content_type:
+        return None
+    media_type = content_type.split(";")[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def parse_quality(candidate):
+    """Poids q d'une entrée de l'en-tête Accept (1 par défaut)"""
+    for param in candidate.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate_response_type(accept, request_media_type):
+    """Choisir le format de réponse : le type supporté de plus fort poids q dans l'en-tête Accept
+    (à poids égal, le premier cité), sinon celui de la requête"""
+    best_type, best_quality = None, 0.0
+    for candidate in (accept or "").split(","):
+        media_type = normalize_media_type(candidate)
+        quality = parse_quality(candidate)
+        if media_type in SUPPORTED_MEDIA_TYPES and quality > best_quality:
+            best_type, best_quality = media_type, quality
+    return best_type or request_media_type
+
+
+def encode_wine_type(values):
+    """Encoder la colonne type de manière vectorisée (red=0, white=1)"""
+    values = np.asarray(values)
+    if values.dtype.kind in "US":
+        # Type déjà encodé mais reçu sous forme de texte (CSV : "0"/"1")
+        try:
+            values = values.astype(np.float32)
+        except ValueError:
+            pass
+    if values.dtype.kind in "iufb":
+        encoded = values.astype(np.float32)
+        if not np.isin(encoded, (0, 1)).all():
+            raise FormatError("Column 'type' must contain 0 (red) or 1 (white)")
+        return encoded
+
+    values = np.char.lower(values.astype(str))
+    is_red = values == "red"
+    if not (is_red | (values == "white")).all():
+        raise FormatError("Column 'type' must contain 'red' or 'white'")
+    return np.where(is_red, 0, 1).astype(np.float32)
+
+
+def columns_to_matrix(columns, n_rows):
+    """Assembler des colonnes en une matrice float32 contiguë et valider le schéma en une passe"""
+    missing = [c for c in FEATURE_COLUMNS if c not in columns]
+    if missing:
+        raise FormatError(f"Missing columns: {missing}")
+
+    X = np.empty((n_rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+    X[:, 0] = encode_wine_type(columns["type"])
+    for i, name in enumerate(FEATURE_COLUMNS[1:], start=1):
+        try:
+            X[:, i] = np.asarray(columns[name], dtype=np.float32)
+        except (TypeError, ValueError) as e:
+            raise FormatError(f"Column '{name}' must be numeric ({e})")
+
+    return validate_matrix(X)
+
+
+def rows_to_matrix(rows):
+    """Liste de lignes (objets WineFeatures) -> matrice, en transposant colonne par colonne"""
+    try:
+        columns = {name: [row[name] for row in rows] for name in FEATURE_COLUMNS}
+    except (KeyError, TypeError) as e:
+        raise FormatError(f"Each row must be an object with fields {FEATURE_COLUMNS} ({e})")
+    return columns_to_matrix(columns, len(rows))
+
+
+def columnar_to_matrix(payload):
+    """Objet colonne -> liste de valeurs : chaque colonne doit être une liste, toutes de même longueur"""
+    missing = [c for c in FEATURE_COLUMNS if c not in payload]
+    if missing:
+        raise FormatError(f"Missing columns: {missing}")
+
+    not_lists = [c for c in FEATURE_COLUMNS if not isinstance(payload[c], list)]
+    if not_lists:
+        raise FormatError(f"Columns must be lists of values, got scalars for {not_lists}")
+
+    lengths = {len(payload[c]) for c in FEATURE_COLUMNS}
+    if len(lengths) != 1:
+        raise FormatError(f"All columns must have the same length, got lengths {sorted(lengths)}")
+
+    return columns_to_matrix(payload, lengths.pop())
+
+
+def validate_matrix(X):
+    """Validation vectorisée d'une matrice de features déjà assemblée"""
+    if X.ndim != 2 or X.shape[1] != len(FEATURE_COLUMNS):
+        raise FormatError(f"Expected a 2D array with {len(FEATURE_COLUMNS)} columns {FEATURE_COLUMNS}, got shape {X.shape}")
+    if X.shape[0] == 0:
+        raise FormatError("Empty batch")
+
+    invalid_rows = np.flatnonzero(~np.isfinite(X).all(axis=1))
+    if invalid_rows.size:
+        raise FormatError(f"Non-finite or missing values in rows {invalid_rows[:10].tolist()}")
+    if not np.isin(X[:, 0], (0, 1)).all():
+        raise FormatError("Column 'type' must contain 0 (red) or 1 (white)")
+
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def decode_json(body):
+    """JSON : liste d'objets WineFeatures ou objet colonne -> liste de valeurs"""
+    payload = orjson.loads(body)
+    if isinstance(payload, list):
+        return rows_to_matrix(payload)
+    if isinstance(payload, dict):
+        return columnar_to_matrix(payload)
+    raise FormatError("JSON body must be a list of rows or an object of columns")
+
+
+def decode_arrow(body):
+    """Arrow IPC (stream ou file) : une colonne par feature"""
+    buffer = pa.py_buffer(body)
+    try:
+        table = ipc.open_stream(buffer).read_all()
+    except pa.ArrowInvalid:
+        table = ipc.open_file(buffer).read_all()
+
+    columns = {
+        name: table.column(name).to_numpy(zero_copy_only=False)
+        for name in table.column_names if name in FEATURE_COLUMNS
+    }
+    return columns_to_matrix(columns, table.num_rows)
+
+
+def decode_msgpack(body):
+    """msgpack : objet colonne -> liste de valeurs, ou liste de lignes"""
+    payload = msgpack.unpackb(body, raw=False)
+    if isinstance(payload, list):
+        return rows_to_matrix(payload)
+    if isinstance(payload, dict):
+        return columnar_to_matrix(payload)
+    raise FormatError("msgpack body must be a list of rows or a map of columns")
+
+
+def decode_npy(body):
+    """.npy : matrice (n, 12) dans l'ordre FEATURE_COLUMNS, type déjà encodé"""
+    X = np.load(io.BytesIO(body), allow_pickle=False)
+    if X.dtype.kind not in "iuf":
+        raise FormatError(f"Expected a numeric array, got dtype {X.dtype}")
+    return validate_matrix(X.astype(np.float32, copy=False))
+
+
+DECODERS = {
+    JSON: decode_json,
+    ARROW: decode_arrow,
+    ARROW_FILE: decode_arrow,
+    MSGPACK: decode_msgpack,
+    NPY: decode_npy,
+}
+
+
+def decode_features(body, media_type):
+    """Décoder un corps de requête en matrice de features float32 contiguë"""
+    decoder = DECODERS.get(media_type)
+    if decoder is None:
+        raise FormatError(f"Unsupported media type '{media_type}'. Supported: {SUPPORTED_MEDIA_TYPES}")
+    try:
+        return decoder(body)
+    except FormatError:
+        raise
+    except Exception as e:
+        raise FormatError(f"Could not decode {media_type} body: {e}")
+
+
+def encode_predictions(predictions, media_type, metadata):
+    """Encoder les prédictions dans le format demandé"""
+    predictions = np.asarray(predictions, dtype=np.float32).reshape(-1)
+    classes = np.rint(predictions).astype(np.int32)
+
+    if media_type in (ARROW, ARROW_FILE):
+        table = pa.table(
+            {"quality_prediction": predictions, "quality_class": classes},
+            metadata={k: str(v) for k, v in metadata.items()}
+        )
+        sink = pa.BufferOutputStream()
+        writer = ipc.new_stream if media_type == ARROW else ipc.new_file
+        with writer(sink, table.schema) as w:
+            w.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if media_type == NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, predictions, allow_pickle=False)
+        return buffer.getvalue()
+
+    if media_type == MSGPACK:
+        return msgpack.packb({
+            **metadata,
+            "quality_prediction": predictions.tolist(),
+            "quality_class": classes.tolist(),
+        })
+
+    payload = {**metadata, "quality_prediction": predictions, "quality_class": classes}
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
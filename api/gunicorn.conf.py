@@ -0,0 +1,66 @@
+import os
+import signal
+import multiprocessing
+import threading
+
+# Serveur multi-workers : les workers uvicorn partagent les poids publiés par un coordinateur unique
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Au démarrage, un worker peut attendre la première publication du modèle
+timeout = 120
+
+# Défini avant le fork : tous les workers démarrent en mode partagé
+os.environ["SERVING_MODE"] = "shared"
+
+coordinator = None
+supervisor_stop = threading.Event()
+COORDINATOR_CHECK_INTERVAL = 5
+
+
+def start_coordinator(server):
+    global coordinator
+    from shared_model import run_coordinator
+
+    # "spawn" : le coordinateur charge TensorFlow, qui n'est pas compatible avec fork
+    coordinator = multiprocessing.get_context("spawn").Process(
+        target=run_coordinator, name="model-coordinator", daemon=True
+    )
+    coordinator.start()
+    server.log.info(f"Coordinateur du modèle démarré (pid {coordinator.pid})")
+
+
+def coordinator_alive():
+    """Le master gunicorn récupère lui-même tous ses enfants (waitpid(-1)) : Process.is_alive()
+    ne voit jamais la fin du coordinateur, on vérifie donc directement son PID"""
+    try:
+        os.kill(coordinator.pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def supervise_coordinator(server):
+    """Redémarrer le coordinateur s'il s'arrête (sans lui, plus aucune nouvelle version n'est publiée)"""
+    while not supervisor_stop.wait(COORDINATOR_CHECK_INTERVAL):
+        if not coordinator_alive():
+            server.log.error(f"Coordinateur arrêté (pid {coordinator.pid}), redémarrage...")
+            start_coordinator(server)
+
+
+def when_ready(server):
+    """Démarrer le coordinateur (seul process qui interroge MLflow) une fois le master prêt"""
+    start_coordinator(server)
+    threading.Thread(target=supervise_coordinator, args=(server, ), name="coordinator-supervisor", daemon=True).start()
+
+
+def post_fork(server, worker):
+    """Les workers sont forkés après le démarrage du coordinateur et hériteraient de la liste des enfants
+    multiprocessing du master : à leur sortie, le handler atexit tenterait d'arrêter le coordinateur"""
+    multiprocessing.process._children.clear()
+
+
+def on_exit(server):
+    supervisor_stop.set()
+    if coordinator is not None and coordinator_alive():
+        os.kill(coordinator.pid, signal.SIGTERM)
@@ -0,0 +1,215 @@
+"""Mode multi-workers : un seul coordinateur interroge MLflow et publie les poids du modèle
+en mémoire partagée ; les workers les ouvrent en lecture seule (memory-mapping, sans copie).
+Ce module ne doit pas importer TensorFlow : seul le coordinateur le charge, dans run_coordinator"""
+import os
+import json
+import time
+import shutil
+import numpy as np
+
+SHARED_MODEL_DIR = os.getenv("SHARED_MODEL_DIR", "/dev/shm/wine-quality-model")
+MODEL_POLL_INTERVAL = int(os.getenv("MODEL_POLL_INTERVAL", "30"))
+POINTER_FILENAME = "current.json"
+KEPT_VERSIONS = 2
+PARITY_SAMPLES = 256
+PARITY_TOLERANCE = 1e-4
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+# Couches sans effet à l'inférence
+PASSTHROUGH_LAYERS = {"InputLayer", "Dropout"}
+
+
+class UnsupportedModelError(ValueError):
+    """Architecture non reproductible par la propagation avant NumPy"""
+
+
+class SharedModelFallback(Exception):
+    """Le coordinateur demande aux workers de repasser en mode single (chargement Keras par worker)"""
+
+
+class SharedModel:
+    """Modèle dense en lecture seule, poids memory-mappés et partagés entre tous les workers"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "layers.json")) as f:
+            layers = json.load(f)
+
+        self.layers = [
+            (
+                np.load(os.path.join(path, f"{i}_kernel.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, f"{i}_bias.npy"), mmap_mode="r"),
+                ACTIVATIONS[layer["activation"]],
+            )
+            for i, layer in enumerate(layers)
+        ]
+
+    def predict(self, X, batch_size=None, verbose=0):
+        """Même interface que keras.Model.predict (propagation avant en NumPy)"""
+        X = np.asarray(X, dtype=np.float32)
+        if batch_size is None or len(X) <= batch_size:
+            return self.forward(X)
+        return np.concatenate([self.forward(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+    def forward(self, X):
+        output = X
+        for kernel, bias, activation in self.layers:
+            output = activation(output @ kernel + bias)
+        return output
+
+
+class SharedModelReader:
+    """Côté worker : détecte la publication d'une nouvelle version via le fichier pointeur"""
+
+    def __init__(self, shared_dir=SHARED_MODEL_DIR):
+        self.pointer_path = os.path.join(shared_dir, POINTER_FILENAME)
+        self.pointer_mtime = None
+        self.pointer = None
+
+    def refresh(self):
+        """Renvoie (modèle, version) si une nouvelle version a été publiée, sinon None.
+        Lève SharedModelFallback si le coordinateur n'a pas pu publier le modèle en mémoire partagée"""
+        try:
+            mtime = os.stat(self.pointer_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self.pointer_mtime:
+            return None
+
+        with open(self.pointer_path) as f:
+            pointer = json.load(f)
+        self.pointer_mtime = mtime
+        self.pointer = pointer
+
+        if pointer.get("fallback"):
+            raise SharedModelFallback(pointer["fallback"])
+        return SharedModel(pointer["path"]), pointer["version"]
+
+
+def export_layers(model, path):
+    """Écrire les poids des couches Dense en .npy (les couches sans effet à l'inférence sont ignorées)"""
+    layers = []
+    for layer in model.layers:
+        layer_type = layer.__class__.__name__
+        if layer_type in PASSTHROUGH_LAYERS:
+            continue
+        if layer_type != "Dense":
+            raise UnsupportedModelError(f"Couche non supportée en mode partagé : {layer_type}")
+        activation = layer.get_config()["activation"]
+        if activation not in ACTIVATIONS:
+            raise UnsupportedModelError(f"Activation non supportée en mode partagé : {activation}")
+
+        weights = layer.get_weights()
+        kernel = weights[0]
+        bias = weights[1] if len(weights) > 1 else np.zeros(kernel.shape[1], dtype=np.float32)
+
+        i = len(layers)
+        np.save(os.path.join(path, f"{i}_kernel.npy"), kernel.astype(np.float32))
+        np.save(os.path.join(path, f"{i}_bias.npy"), bias.astype(np.float32))
+        layers.append({"name": layer.name, "activation": activation})
+
+    with open(os.path.join(path, "layers.json"), "w") as f:
+        json.dump(layers, f)
+
+
+def check_parity(model, path):
+    """Comparer la propagation NumPy à keras.Model.predict avant toute publication"""
+    X = np.random.default_rng(0).uniform(0, 1, size=(PARITY_SAMPLES, model.input_shape[-1])).astype(np.float32)
+    expected = model.predict(X, verbose=0)
+    actual = SharedModel(path).predict(X)
+
+    max_error = float(np.max(np.abs(expected - actual)))
+    if actual.shape != expected.shape or max_error > PARITY_TOLERANCE:
+        raise UnsupportedModelError(f"Écart avec keras.Model.predict : {max_error:.2e} > {PARITY_TOLERANCE}")
+
+
+def write_pointer(pointer, shared_dir=SHARED_MODEL_DIR):
+    """Bascule atomique du pointeur lu par tous les workers"""
+    pointer_tmp = os.path.join(shared_dir, f"{POINTER_FILENAME}.tmp")
+    with open(pointer_tmp, "w") as f:
+        json.dump(pointer, f)
+    os.replace(pointer_tmp, os.path.join(shared_dir, POINTER_FILENAME))
+
+
+def publish_model(model, version, metadata=None, shared_dir=SHARED_MODEL_DIR):
+    """Exporter les poids, vérifier la parité avec Keras, puis basculer le pointeur"""
+    path = os.path.join(shared_dir, f"v{version}")
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    try:
+        export_layers(model, tmp_path)
+        check_parity(model, tmp_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+    write_pointer({"version": version, "path": path, **(metadata or {})}, shared_dir)
+    prune_versions(shared_dir)
+
+
+def publish_fallback(version, reason, metadata=None, shared_dir=SHARED_MODEL_DIR):
+    """Demander aux workers de charger eux-mêmes le modèle Keras (mode single)"""
+    write_pointer({"version": version, "fallback": reason, **(metadata or {})}, shared_dir)
+
+
+def prune_versions(shared_dir=SHARED_MODEL_DIR, keep=KEPT_VERSIONS):
+    """Supprimer les anciennes versions (les workers qui les mappent encore gardent leur accès)"""
+    versions = sorted(
+        (name for name in os.listdir(shared_dir) if name.startswith("v") and name[1:].isdigit()),
+        key=lambda name: int(name[1:])
+    )
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(shared_dir, name), ignore_errors=True)
+
+
+def run_coordinator(poll_interval=MODEL_POLL_INTERVAL, shared_dir=SHARED_MODEL_DIR):
+    """Boucle du coordinateur : seul process à interroger le registre MLflow et à charger TensorFlow"""
+    import mlflow
+    import mlflow.keras
+    from mlflow.tracking import MlflowClient
+
+    model_name = os.getenv("MODEL_NAME", "wine-quality-model")
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000"))
+    client = MlflowClient()
+    os.makedirs(shared_dir, exist_ok=True)
+
+    published_version = None
+    while True:
+        try:
+            versions = client.search_model_versions(f"name='{model_name}'")
+            if versions:
+                latest = max(versions, key=lambda x: int(x.version))
+
+                if latest.version != published_version:
+                    # Métadonnées servies par /model/info sans appel à MLflow depuis les workers
+                    metadata = {
+                        "run_id": latest.run_id,
+                        "status": latest.status,
+                        "creation_timestamp": latest.creation_timestamp
+                    }
+                    model = mlflow.keras.load_model(f"models:/{model_name}/{latest.version}")
+                    try:
+                        publish_model(model, latest.version, metadata, shared_dir)
+                        print(f"✓ Coordinateur : version {latest.version} publiée dans {shared_dir}")
+                    except UnsupportedModelError as e:
+                        publish_fallback(latest.version, str(e), metadata, shared_dir)
+                        print(f"✗ Coordinateur : version {latest.version} non publiable en mémoire partagée ({e}).")
+                        print("✗ Coordinateur : les workers repassent en mode single (un modèle Keras par worker).")
+                    published_version = latest.version
+            else:
+                print(f"⚠ Coordinateur : aucun modèle '{model_name}' trouvé.")
+
+        except Exception as e:
+            print(f"✗ Coordinateur : erreur lors de la mise à jour du modèle: {e}")
+
+        time.sleep(poll_interval)
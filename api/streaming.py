@@ -0,0 +1,111 @@
+"""Scoring en flux : lecture incrémentale d'un corps NDJSON/CSV et réponse chunkée, à mémoire constante"""
+import os
+import csv
+import anyio
+import numpy as np
+import orjson
+from starlette.responses import StreamingResponse
+from formats import FormatError, NDJSON, CSV, columns_to_matrix, rows_to_matrix
+
+STREAMING_MEDIA_TYPES = [NDJSON, CSV]
+# Une ligne (un vin) fait quelques centaines d'octets : au-delà, le corps n'est pas découpé en lignes
+MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse qui n'écoute pas le canal receive pendant l'envoi.
+    Par défaut Starlette y attend la déconnexion du client et consommerait le corps de la requête,
+    encore en cours de lecture ; une déconnexion est quand même détectée par request.stream()"""
+
+    async def listen_for_disconnect(self, receive):
+        await anyio.sleep_forever()
+
+
+async def iter_lines(byte_stream, max_line_bytes=MAX_LINE_BYTES):
+    """Découper un flux d'octets en lignes sans jamais garder plus d'une ligne incomplète en mémoire"""
+    buffer = bytearray()
+    async for chunk in byte_stream:
+        start = 0
+        end = chunk.find(b"\n")
+        while end != -1:
+            buffer += chunk[start:end]
+            if buffer.strip():
+                yield bytes(buffer)
+            buffer.clear()
+            start = end + 1
+            end = chunk.find(b"\n", start)
+
+        # Fin de chunk sans retour à la ligne : ajout en place, sans recopier ce qui précède
+        buffer += chunk[start:]
+        if len(buffer) > max_line_bytes:
+            raise FormatError(f"Line exceeds {max_line_bytes} bytes (missing newline delimiter?)")
+    if buffer.strip():
+        yield bytes(buffer)
+
+
+async def iter_feature_chunks(byte_stream, media_type, chunk_size):
+    """Regrouper les lignes en blocs de chunk_size et les convertir en matrices float32"""
+    header = None
+    rows = []
+    async for line in iter_lines(byte_stream):
+        if media_type == CSV and header is None:
+            header = next(csv.reader([line.decode().strip()]))
+            continue
+
+        rows.append(line)
+        if len(rows) == chunk_size:
+            yield parse_rows(rows, media_type, header)
+            rows = []
+
+    if rows:
+        yield parse_rows(rows, media_type, header)
+
+
+def parse_rows(lines, media_type, header=None):
+    """Convertir un bloc de lignes brutes en matrice de features validée"""
+    try:
+        if media_type == NDJSON:
+            return rows_to_matrix([orjson.loads(line) for line in lines])
+
+        # Lecture ligne par ligne : un champ entre guillemets contenant un retour à la ligne n'est pas supporté
+        if any(line.count(b'"') % 2 for line in lines):
+            raise FormatError("Quoted CSV fields containing newlines are not supported")
+        values = list(csv.reader(line.decode().strip() for line in lines))
+        if any(len(row) != len(header) for row in values):
+            raise FormatError(f"Each CSV row must have {len(header)} fields")
+        return columns_to_matrix(dict(zip(header, zip(*values))), len(values))
+    except FormatError:
+        raise
+    except Exception as e:
+        raise FormatError(f"Could not decode {media_type} rows: {e}")
+
+
+def encode_chunk(predictions, media_type, first=False):
+    """Encoder les prédictions d'un bloc (une ligne par vin, dans l'ordre de la requête)"""
+    predictions = np.asarray(predictions, dtype=np.float32).reshape(-1)
+    classes = np.rint(predictions).astype(np.int32)
+
+    if media_type == CSV:
+        lines = [f"{p:.6f},{c}" for p, c in zip(predictions.tolist(), classes.tolist())]
+        if first:
+            lines.insert(0, "quality_prediction,quality_class")
+        return ("\n".join(lines) + "\n").encode()
+
+    return b"".join(
+        orjson.dumps({"quality_prediction": p, "quality_class": c}) + b"\n"
+        for p, c in zip(predictions.tolist(), classes.tolist())
+    )
+
+
+def encode_error(message, media_type, count):
+    """Erreur survenue après l'envoi des en-têtes : signalée dans le flux, qui s'arrête ensuite"""
+    if media_type == CSV:
+        return f"# error: {message} (after {count} rows)\n".encode()
+    return orjson.dumps({"error": message, "count": count}) + b"\n"
+
+
+def encode_end(media_type, count):
+    """Enregistrement final : son absence indique au client un flux tronqué"""
+    if media_type == CSV:
+        return f"# end: {count} rows\n".encode()
+    return orjson.dumps({"done": True, "count": count}) + b"\n"
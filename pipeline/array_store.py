@@ -0,0 +1,113 @@
+import os
+import hashlib
+from dataclasses import dataclass
+import numpy as np
+from config import ARRAY_STORE_DIR, ARRAY_STORE_MAX_BYTES
+
+
+@dataclass(frozen=True)
+class ArrayRef:
+    """Référence légère vers un tableau stocké en .npy (c'est elle qui circule entre les tasks, pas le tableau)"""
+    key: str
+    path: str
+    shape: tuple
+    dtype: str
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calculer l'empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Construire une clé de cache déterministe à partir de plusieurs éléments"""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:32]
+
+
+def save_array(array, key: str, store_dir: str = ARRAY_STORE_DIR, evict: bool = True) -> ArrayRef:
+    """Écrire un tableau en .npy (écriture atomique) et renvoyer sa référence.
+    Avec evict=False, l'appelant lance lui-même l'éviction une fois toutes ses sorties écrites"""
+    os.makedirs(store_dir, exist_ok=True)
+    array = np.ascontiguousarray(array)
+    path = os.path.join(store_dir, f"{key}.npy")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+    ref = ArrayRef(key=key, path=path, shape=tuple(array.shape), dtype=str(array.dtype))
+    if evict:
+        evict_arrays(protect=[ref], store_dir=store_dir)
+    return ref
+
+
+def load_array(ref: ArrayRef):
+    """Ouvrir un tableau stocké en lecture seule, par memory-mapping (aucune copie)"""
+    if not ref.exists():
+        raise FileNotFoundError(f"Le tableau {ref.key} a été évincé du cache ({ref.path}).")
+    # Mettre à jour la date d'accès pour l'éviction LRU
+    os.utime(ref.path)
+    return np.load(ref.path, mmap_mode="r")
+
+
+def concat_arrays(refs, store_dir: str = ARRAY_STORE_DIR) -> ArrayRef:
+    """Concaténer plusieurs tableaux stockés (résultat réutilisé s'il existe déjà)"""
+    key = make_key("concat", *(ref.key for ref in refs))
+    path = os.path.join(store_dir, f"{key}.npy")
+    if os.path.exists(path):
+        os.utime(path)
+        array = np.load(path, mmap_mode="r")
+        return ArrayRef(key=key, path=path, shape=tuple(array.shape), dtype=str(array.dtype))
+
+    ref = save_array(np.concatenate([load_array(ref) for ref in refs]), key, store_dir, evict=False)
+    evict_arrays(protect=list(refs) + [ref], store_dir=store_dir)
+    return ref
+
+
+def evict_arrays(max_bytes: int = ARRAY_STORE_MAX_BYTES, protect=(), store_dir: str = ARRAY_STORE_DIR) -> list:
+    """Supprimer les tableaux les moins récemment utilisés tant que le cache dépasse sa taille maximale.
+    protect : chemins ou ArrayRef utilisés par l'appel en cours, jamais évincés"""
+    if not os.path.isdir(store_dir):
+        return []
+    protect = {getattr(p, "path", p) for p in protect}
+
+    entries = []
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name.endswith(".npy") and os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in protect:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            evicted.append(path)
+        except FileNotFoundError:
+            pass
+
+    return evicted
+
+
+def run_with_array_cache(task_fn, *args, **kwargs):
+    """Exécuter une task en cache ; si un tableau référencé par le résultat a été évincé, recalculer"""
+    result = task_fn(*args, **kwargs)
+    refs = result if isinstance(result, (tuple, list)) else (result, )
+
+    if all(ref.exists() for ref in refs if isinstance(ref, ArrayRef)):
+        return result
+    return task_fn.with_options(refresh_cache=True)(*args, **kwargs)
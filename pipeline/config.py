@@ -20,4 +20,26 @@ MODEL_PARAMS = {
     "loss_function": "mse",
     "dropout_rate": 0.2,
     "hidden_units": [512, 256],
+}
+
+CV_PARAMS = {
+    "n_splits": 5,
+    "random_state": 1,
+    "max_workers": None,  # None = min(n_splits, nombre de coeurs)
+    "tf_threads": 1,      # Threads TensorFlow par process (évite la sur-souscription)
+}
+
+# Cache des étapes de préparation (clés = empreinte des entrées)
+ARRAY_STORE_DIR = "/app/array_store"
+
+ARRAY_STORE_MAX_BYTES = 2 * 1024 ** 3  # Taille max des .npy en cache (éviction LRU au-delà)
+
+CACHE_EXPIRATION_DAYS = 7
+
+# Logs MLflow hors du chemin critique de l'entraînement
+MLFLOW_LOGGING = {
+    "async": True,
+    "metrics_batch_epochs": 10,  # Nombre d'epochs regroupées par appel log_batch
+    "retries": 5,
+    "retry_delay": 5,            # Délai initial (s), doublé à chaque tentative
 }
\ No newline at end of file
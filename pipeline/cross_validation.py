@@ -0,0 +1,99 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.model_selection import KFold
+from prefect import task, get_run_logger
+from config import MODEL_PARAMS, CV_PARAMS
+from array_store import ArrayRef, load_array
+
+
+# FONCTION CLASSIQUE = Initialisation de chaque process worker
+def init_worker(tf_threads):
+    """Limiter le nombre de threads TensorFlow/BLAS du process (avant toute initialisation de TF)"""
+    os.environ["OMP_NUM_THREADS"] = str(tf_threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(tf_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(tf_threads)
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(tf_threads)
+
+
+# FONCTION CLASSIQUE = Entraînement d'un fold (exécutée dans un process séparé)
+def train_fold(fold, X, y, train_idx, val_idx, epochs, batch_size):
+    """Entraîne un modèle neuf sur un fold et renvoie ses métriques de validation"""
+    # Imports locaux : TensorFlow ne doit être chargé que dans le worker
+    from model_creation import build_model
+    from model_training import train_model_core, evaluate_model_core
+
+    # Avec des ArrayRef, chaque worker ouvre les .npy par memory-mapping au lieu de recevoir une copie picklée
+    if isinstance(X, ArrayRef):
+        X, y = load_array(X), load_array(y)
+    X_train, y_train, X_val, y_val = X[train_idx], y[train_idx], X[val_idx], y[val_idx]
+
+    model = build_model((X_train.shape[1], ))
+    model, history = train_model_core(model, X_train, y_train, X_val, y_val, epochs, batch_size)
+    val_loss, val_mae, val_mse = evaluate_model_core(model, X_val, y_val)
+
+    return {
+        "fold": fold,
+        "val_loss": float(val_loss),
+        "val_mae": float(val_mae),
+        "val_mse": float(val_mse),
+    }
+
+
+# FONCTION CLASSIQUE = Agrégation des métriques
+def aggregate_fold_metrics(fold_results):
+    """Construire les métriques MLflow : une par fold, puis moyenne et écart-type"""
+    metrics = {}
+    for result in sorted(fold_results, key=lambda r: r["fold"]):
+        for name in ("val_loss", "val_mae", "val_mse"):
+            metrics[f"cv_fold_{result['fold']}_{name}"] = result[name]
+
+    for name in ("val_loss", "val_mae", "val_mse"):
+        values = np.array([r[name] for r in fold_results])
+        metrics[f"cv_{name}_mean"] = float(values.mean())
+        metrics[f"cv_{name}_std"] = float(values.std())
+
+    return metrics
+
+
+# TASK PREFECT = Orchestration + appel de la logique
+@task
+def cross_validate_model(X, y, n_splits=CV_PARAMS['n_splits'], random_state=CV_PARAMS['random_state'],
+                         max_workers=CV_PARAMS['max_workers'], tf_threads=CV_PARAMS['tf_threads'],
+                         epochs=MODEL_PARAMS['epochs'], batch_size=MODEL_PARAMS['batch_size']):
+    """Task Prefect : validation croisée k-fold, les folds sont entraînés en parallèle sur plusieurs process"""
+    logger = get_run_logger()
+
+    if not isinstance(X, ArrayRef):
+        X = np.asarray(X)
+        y = np.asarray(y)
+    n_samples = X.shape[0]
+    if max_workers is None:
+        max_workers = min(n_splits, os.cpu_count() or 1)
+
+    logger.info(f"Validation croisée : {n_splits} folds sur {max_workers} process ({tf_threads} thread(s) TF chacun)")
+
+    kfold = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+
+    # "spawn" : TensorFlow n'est pas compatible avec fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=init_worker, initargs=(tf_threads, )) as executor:
+        futures = [
+            executor.submit(train_fold, fold, X, y, train_idx, val_idx, epochs, batch_size)
+            for fold, (train_idx, val_idx) in enumerate(kfold.split(np.arange(n_samples)))
+        ]
+        fold_results = [future.result() for future in futures]
+
+    for result in fold_results:
+        logger.info(f"Fold {result['fold']} - val_loss: {result['val_loss']:.4f}, val_mae: {result['val_mae']:.4f}")
+
+    metrics = aggregate_fold_metrics(fold_results)
+    logger.info(f"Validation croisée - val_mae: {metrics['cv_val_mae_mean']:.4f} ± {metrics['cv_val_mae_std']:.4f}")
+
+    return metrics
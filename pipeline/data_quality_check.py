@@ -116,7 +116,8 @@ def check_model() -> dict:
         results = {}
         
         # Vérifier MAE
-        mae_keys = ["mean_absolute_error", "test_mae", "val_mae", "mae"]
+        # La moyenne de la validation croisée est prioritaire sur l'estimation d'un seul split
+        mae_keys = ["cv_val_mae_mean", "mean_absolute_error", "test_mae", "val_mae", "mae"]
         mae_value = None
         for key in mae_keys:
             if key in metrics:
@@ -124,6 +125,8 @@ def check_model() -> dict:
                 break
         
         if mae_value is not None:
+            if "cv_val_mae_std" in metrics:
+                logger.info(f"MAE validation croisée: {mae_value:.4f} ± {metrics['cv_val_mae_std']:.4f}")
             results["mae_ok"] = mae_value <= MIN_MAE
             if results["mae_ok"]:
                 logger.info(f"MAE: {mae_value:.4f} <= {MIN_MAE} (seuil)")
@@ -133,7 +136,7 @@ def check_model() -> dict:
             results["mae_ok"] = None
             logger.warning(f"Aucune métrique MAE trouvée parmi {mae_keys}")
         # Vérifier Loss
-        loss_keys = ["loss", "test_loss", "val_loss"]
+        loss_keys = ["cv_val_loss_mean", "loss", "test_loss", "val_loss"]
         loss_value = None
         for key in loss_keys:
             if key in metrics:
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 from prefect import flow, task
 from config import DL_TEMP_FILENAME
+from array_store import hash_file
 
 @flow
 def load_data(file_path):
@@ -16,6 +17,11 @@ def check_file_exists(file_path):
 
     return True
 
+@task
+def compute_data_hash(file_path):
+    """Empreinte du contenu du fichier, utilisée comme clé de cache du prétraitement"""
+    return hash_file(file_path)
+
 @task
 def download_data(url: str):
     try:
@@ -0,0 +1,138 @@
+import time
+import numpy as np
+import mlflow
+import mlflow.keras
+from concurrent.futures import Future, ThreadPoolExecutor
+from keras.callbacks import Callback
+from mlflow.entities import Metric, Param
+from mlflow.models import ModelSignature
+from mlflow.tracking import MlflowClient
+from mlflow.types.schema import Schema, TensorSpec
+from config import MODEL_NAME, MLFLOW_LOGGING
+
+PIP_REQUIREMENTS = [
+    "tensorflow",
+    "keras",
+    "numpy",
+    "pandas",
+    "scikit-learn"
+]
+
+# Un seul worker : les uploads s'enchaînent dans l'ordre des runs
+upload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mlflow-upload")
+
+
+# FONCTION CLASSIQUE = Appel MLflow tolérant aux indisponibilités passagères
+def with_retries(fn, *args, retries=MLFLOW_LOGGING['retries'], retry_delay=MLFLOW_LOGGING['retry_delay'], **kwargs):
+    """Réessayer un appel MLflow avec un délai exponentiel"""
+    for attempt in range(retries):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            delay = retry_delay * 2 ** attempt
+            print(f"✗ MLflow indisponible ({e}), nouvelle tentative {attempt + 2}/{retries} dans {delay}s...")
+            time.sleep(delay)
+
+
+# FONCTION CLASSIQUE = Signature du modèle sans prédiction
+def signature_from_schema(model, X):
+    """Construire la signature à partir des formes d'entrée/sortie du modèle (sans appel à model.predict)"""
+    return ModelSignature(
+        inputs=Schema([TensorSpec(np.dtype(X.dtype), (-1, X.shape[1]))]),
+        outputs=Schema([TensorSpec(np.dtype("float32"), (-1, model.output_shape[-1]))])
+    )
+
+
+def to_metrics(values, step=0):
+    timestamp = int(time.time() * 1000)
+    return [Metric(key, float(value), timestamp, step) for key, value in values.items()]
+
+
+def to_params(values):
+    return [Param(key, str(value)) for key, value in values.items()]
+
+
+class BatchedMetricsLogger(Callback):
+    """Callback Keras : regroupe les métriques de plusieurs epochs dans un seul appel log_batch asynchrone"""
+
+    def __init__(self, client, run_id, batch_epochs=MLFLOW_LOGGING['metrics_batch_epochs']):
+        super().__init__()
+        self.client = client
+        self.run_id = run_id
+        self.batch_epochs = batch_epochs
+        self.pending = []
+        self.pending_epochs = 0
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Préfixe "epoch_" : ne pas confondre la loss d'entraînement avec les métriques lues par check_model
+        self.pending.extend(to_metrics({f"epoch_{k}": v for k, v in (logs or {}).items()}, step=epoch))
+        self.pending_epochs += 1
+        if self.pending_epochs >= self.batch_epochs:
+            self.flush()
+
+    def on_train_end(self, logs=None):
+        self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            self.client.log_batch(self.run_id, metrics=self.pending, synchronous=False)
+        except Exception as e:
+            # Les métriques d'epoch ne doivent pas interrompre l'entraînement
+            print(f"⚠ Échec du log des métriques d'epoch: {e}")
+        self.pending = []
+        self.pending_epochs = 0
+
+
+# FONCTION CLASSIQUE = Exécutée par le worker d'upload
+def upload_and_register_model(model, run_id, signature, params=None, metrics=None):
+    """Log des paramètres et métriques de validation, upload du modèle puis enregistrement dans le registre,
+    chacun avec ses propres tentatives : une version n'est enregistrée que si ses métriques sont bien loggées"""
+    client = MlflowClient()
+    try:
+        # Les métriques d'epoch restent asynchrones (au mieux) ; la file asynchrone ignore ses échecs,
+        # les métriques lues par check_model sont donc loggées de manière synchrone
+        with_retries(mlflow.flush_async_logging)
+        with_retries(client.log_batch, run_id, metrics=to_metrics(metrics or {}), params=to_params(params or {}))
+
+        def log_model():
+            with mlflow.start_run(run_id=run_id):
+                return mlflow.keras.log_model(
+                    model=model,
+                    artifact_path=MODEL_NAME,
+                    signature=signature,
+                    pip_requirements=PIP_REQUIREMENTS
+                )
+
+        model_info = with_retries(log_model)
+        version = with_retries(mlflow.register_model, model_info.model_uri, MODEL_NAME)
+
+        print(f"Modèle loggé et enregistré: {MODEL_NAME}")
+        print(f"Version: {version.version}")
+        return version
+
+    except Exception as e:
+        print(f"✗ Échec définitif de l'upload du modèle (run {run_id}): {e}")
+        try:
+            client.set_terminated(run_id, status="FAILED")
+        except Exception:
+            pass
+        return None
+
+
+def submit_model_upload(model, run_id, signature, params=None, metrics=None):
+    """Lancer le log des métriques, l'upload et l'enregistrement du modèle en arrière-plan.
+    Le modèle transmis ne doit plus être utilisé par l'appelant (sauvegardé pendant l'upload)"""
+    return upload_executor.submit(upload_and_register_model, model, run_id, signature, params, metrics)
+
+
+def wait_for_model_upload(model_info):
+    """Numéro de la version enregistrée (str), ou None si l'upload a échoué, quel que soit le mode :
+    ModelInfo en mode synchrone, Future du worker d'upload en mode asynchrone"""
+    if isinstance(model_info, Future):
+        version = model_info.result()
+        return version.version if version is not None else None
+    return str(model_info.registered_model_version)
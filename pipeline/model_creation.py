@@ -2,8 +2,8 @@ from prefect import task
 from keras.models import Sequential
 from keras.layers import Input,Dense
 
-@task
-def create_model(input_shape):
+# FONCTION CLASSIQUE = Logique métier pure (réutilisée par la validation croisée)
+def build_model(input_shape):
   model = Sequential()
 
   # Entrée du modèle
@@ -21,4 +21,8 @@ def create_model(input_shape):
   # Compilation du modèle
   model.compile(optimizer="adam", loss="mae", metrics=["mae", "mse"])
 
-  return model
\ No newline at end of file
+  return model
+
+@task
+def create_model(input_shape):
+  return build_model(input_shape)
\ No newline at end of file
@@ -1,13 +1,18 @@
 import mlflow
 import mlflow.keras
-from mlflow.models import infer_signature
-from config import MODEL_PARAMS, MODEL_NAME
+from mlflow.tracking import MlflowClient
+from mlflow.tracking.context.registry import resolve_tags
+from config import MODEL_PARAMS, MODEL_NAME, CV_PARAMS, EXPERIMENT_NAME, RUN_NAME, MLFLOW_LOGGING
+from model_creation import build_model
+from mlflow_logging import (
+    BatchedMetricsLogger, PIP_REQUIREMENTS, signature_from_schema, submit_model_upload, to_metrics, to_params, with_retries
+)
 from prefect import task
 
 # FONCTION CLASSIQUE = Logique métier pure
-def train_model_core(model, X_train, y_train, X_val, y_val, epochs=MODEL_PARAMS['epochs'], batch_size=MODEL_PARAMS['batch_size']):
+def train_model_core(model, X_train, y_train, X_val, y_val, epochs=MODEL_PARAMS['epochs'], batch_size=MODEL_PARAMS['batch_size'], callbacks=None):
     """Entraînement du modèle (fonction interne)"""
-    history = model.fit(X_train, y_train, validation_data=(X_val, y_val), epochs=epochs, batch_size=batch_size, verbose=1)
+    history = model.fit(X_train, y_train, validation_data=(X_val, y_val), epochs=epochs, batch_size=batch_size, verbose=1, callbacks=callbacks)
     return model, history
 
 # FONCTION CLASSIQUE = Logique métier pure
@@ -18,8 +23,11 @@ def evaluate_model_core(model, X_test, y_test):
 
 # TASK PREFECT = Orchestration + appel de la logique
 @task
-def train_and_log_model(model, X_train, y_train, X_val, y_val, epochs=MODEL_PARAMS['epochs'], batch_size=MODEL_PARAMS['batch_size']):
+def train_and_log_model(model, X_train, y_train, X_val, y_val, epochs=MODEL_PARAMS['epochs'], batch_size=MODEL_PARAMS['batch_size'], cv_metrics=None, async_logging=MLFLOW_LOGGING['async']):
     """Task Prefect principal : entraîne et log le modèle"""
+    if async_logging:
+        return train_and_log_model_async(model, X_train, y_train, X_val, y_val, epochs, batch_size, cv_metrics)
+
     with mlflow.start_run():
         # Appel des fonctions normales (pas des tasks)
         model, history = train_model_core(model, X_train, y_train, X_val, y_val, epochs, batch_size)
@@ -30,23 +38,19 @@ def train_and_log_model(model, X_train, y_train, X_val, y_val, epochs=MODEL_PARA
         mlflow.log_metric("val_loss", history.history['val_loss'][-1])
         mlflow.log_metric("val_mae", history.history.get('val_mae', [0])[-1])
 
-        sample_input = X_val[:100]
-        sample_predictions = model.predict(sample_input)
+        # Métriques de validation croisée (par fold + moyenne/écart-type)
+        if cv_metrics:
+            mlflow.log_params({f"cv_{k}": v for k, v in CV_PARAMS.items()})
+            mlflow.log_metrics(cv_metrics)
 
-        signature = infer_signature(sample_input, sample_predictions)
+        signature = signature_from_schema(model, X_val)
         
         model_info = mlflow.keras.log_model(
             model=model,
             artifact_path=MODEL_NAME,
             signature=signature,
             registered_model_name=MODEL_NAME,
-            pip_requirements=[
-                "tensorflow",
-                "keras",
-                "numpy",
-                "pandas",
-                "scikit-learn"
-            ]
+            pip_requirements=PIP_REQUIREMENTS
         )
 
         print(f"Modèle loggé et enregistré: {MODEL_NAME}")
@@ -55,6 +59,53 @@ def train_and_log_model(model, X_train, y_train, X_val, y_val, epochs=MODEL_PARA
         
         return model, model_info
 
+# FONCTION CLASSIQUE = Variante asynchrone de train_and_log_model
+def train_and_log_model_async(model, X_train, y_train, X_val, y_val, epochs, batch_size, cv_metrics=None):
+    """Entraînement avec logs MLflow hors du chemin critique : métriques d'epoch groupées en log_batch asynchrones,
+    upload et enregistrement du modèle dans un worker en arrière-plan (renvoie un future à la place de model_info)"""
+    client = MlflowClient()
+    experiment = with_retries(mlflow.get_experiment_by_name, EXPERIMENT_NAME)
+    # Mêmes tags par défaut (utilisateur, source, commit git...) qu'un run ouvert par mlflow.start_run()
+    run = with_retries(client.create_run, experiment.experiment_id, run_name=RUN_NAME, tags=resolve_tags())
+    run_id = run.info.run_id
+
+    try:
+        params = dict(MODEL_PARAMS)
+        if cv_metrics:
+            params.update({f"cv_{k}": v for k, v in CV_PARAMS.items()})
+
+        metrics_logger = BatchedMetricsLogger(client, run_id)
+        model, history = train_model_core(model, X_train, y_train, X_val, y_val, epochs, batch_size, callbacks=[metrics_logger])
+
+        loss = evaluate_model_core(model, X_val, y_val)
+
+        final_metrics = {
+            "val_loss": history.history['val_loss'][-1],
+            "val_mae": history.history.get('val_mae', [0])[-1],
+            **(cv_metrics or {})
+        }
+
+        # Le worker sauvegarde une copie des poids : le modèle renvoyé peut être évalué pendant l'upload
+        upload_model = build_model(model.input_shape[1:])
+        upload_model.set_weights(model.get_weights())
+
+        # Paramètres et métriques de validation loggés par le worker, avant l'enregistrement du modèle
+        model_info = submit_model_upload(
+            upload_model, run_id, signature_from_schema(model, X_val), params=params, metrics=final_metrics
+        )
+    except Exception:
+        # Comme la sortie en erreur de mlflow.start_run() : le run ne reste pas RUNNING
+        try:
+            client.set_terminated(run_id, status="FAILED")
+        except Exception as e:
+            print(f"⚠ Impossible de marquer le run {run_id} en échec: {e}")
+        raise
+
+    print(f"Upload du modèle lancé en arrière-plan (run {run_id})")
+    print(f"Validation loss: {loss}")
+
+    return model, model_info
+
 @task
 def evaluate_model(model, X_test, y_test):
     """Task Prefect : évalue le modèle sur le test set"""
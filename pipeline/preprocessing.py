@@ -2,7 +2,20 @@ from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
+from datetime import timedelta
+import numpy as np
+import pandas as pd
 from prefect import flow, task
+from array_store import save_array, evict_arrays, make_key, hash_file
+from config import CACHE_EXPIRATION_DAYS
+
+# Empreinte du code de ce module : toute modification du prétraitement invalide le cache
+PREPROCESSING_VERSION = hash_file(__file__)
+
+
+def preprocess_cache_key(context, parameters):
+    """Clé de cache : contenu du fichier + version du code de prétraitement (le chemin n'intervient pas)"""
+    return make_key(parameters["data_hash"], PREPROCESSING_VERSION)
 
 @flow
 def preprocess_data(data):
@@ -19,6 +32,22 @@ def preprocess_data(data):
 
     return X_processed, y_processed, preprocessor
 
+@task(
+    cache_key_fn=preprocess_cache_key,
+    cache_expiration=timedelta(days=CACHE_EXPIRATION_DAYS),
+    persist_result=True
+)
+def preprocess_file(file_path, data_hash):
+    """Prétraiter un fichier CSV, mis en cache selon l'empreinte de son contenu.
+    Les tableaux sont écrits en .npy ; seules leurs références transitent entre les tasks"""
+    data = pd.read_csv(file_path)
+    X_processed, y_processed, preprocessor = preprocess_data(data)
+
+    X_ref = save_array(np.asarray(X_processed), make_key(data_hash, PREPROCESSING_VERSION, "X"), evict=False)
+    y_ref = save_array(np.asarray(y_processed), make_key(data_hash, PREPROCESSING_VERSION, "y"), evict=False)
+    evict_arrays(protect=[X_ref, y_ref])
+    return X_ref, y_ref, preprocessor
+
 @task
 def prepare_y(y):
     """Normaliser la target (qualité) entre 0 et 1"""
@@ -1,8 +1,37 @@
+from datetime import timedelta
 from sklearn.model_selection import train_test_split as sklearn_train_test_split
 from prefect import task
+from prefect.cache_policies import INPUTS, TASK_SOURCE
+from array_store import ArrayRef, load_array, save_array, evict_arrays, make_key, hash_file
+from config import CACHE_EXPIRATION_DAYS
 
-@task
+# Empreinte du code de ce module, intégrée à la clé des tableaux produits
+SPLIT_VERSION = hash_file(__file__)
+
+@task(
+    cache_policy=INPUTS + TASK_SOURCE,
+    cache_expiration=timedelta(days=CACHE_EXPIRATION_DAYS),
+    persist_result=True
+)
 def train_test_split(X, y, test_size=0.2, random_state=1):
+    # Avec des ArrayRef en entrée, la clé de cache dépend des clés des tableaux, qui intègrent l'empreinte
+    # du fichier de données et la version du code de prétraitement, plus la version du code de ce module
+    if isinstance(X, ArrayRef):
+        split_key = make_key(X.key, y.key, test_size, random_state, SPLIT_VERSION)
+        input_refs = [X, y]
+        X, y = load_array(X), load_array(y)
+    else:
+        split_key = None
+
     X_train, X_test, y_train, y_test = sklearn_train_test_split(X, y, test_size=test_size, random_state=random_state)
     X_train, X_val, y_train, y_val = sklearn_train_test_split(X_train, y_train, test_size=0.25, random_state=random_state)
-    return X_train, X_test, X_val, y_train, y_test, y_val
\ No newline at end of file
+
+    if split_key is None:
+        return X_train, X_test, X_val, y_train, y_test, y_val
+
+    names = ["X_train", "X_test", "X_val", "y_train", "y_test", "y_val"]
+    arrays = [X_train, X_test, X_val, y_train, y_test, y_val]
+    refs = tuple(save_array(array, make_key(split_key, name), evict=False) for name, array in zip(names, arrays))
+    # Éviction une seule fois, en protégeant les entrées et toutes les sorties de ce split
+    evict_arrays(protect=input_refs + list(refs))
+    return refs
\ No newline at end of file
@@ -2,14 +2,17 @@ from prefect import flow, task
 import mlflow
 from mlflow.tracking import MlflowClient
 from model_training import train_and_log_model, evaluate_model
+from mlflow_logging import wait_for_model_upload
 from config import MLFLOW_URI, EXPERIMENT_NAME, DATA_PATH, MODEL_NAME, DL_TEMP_FILENAME
-from load_data import load_data
 from train_test_split import train_test_split
+from cross_validation import cross_validate_model
 from model_creation import create_model
-from preprocessing import preprocess_data
+from preprocessing import preprocess_file
+from array_store import load_array, concat_arrays, run_with_array_cache
 from data_quality_check import check_data, check_model
 from prefect import get_run_logger
-from load_data import check_file_exists, download_data, delete_temp_file
+from prefect.task_runners import ThreadPoolTaskRunner
+from load_data import check_file_exists, download_data, delete_temp_file, compute_data_hash
 
 @task
 def validate_input_data(data_path: str):
@@ -79,6 +82,21 @@ def soft_validate_input_data(data_path: str):
         logger.warning("Le pipeline continue malgré l'erreur...")
         return None
 
+@task
+def blocking_validate_input_data(data_path: str):
+    """Vérifier la qualité des données AVANT l'entraînement - VERSION BLOQUANTE (interrompt le pipeline)"""
+    logger = get_run_logger()
+    logger.info("Validation bloquante des données d'entrée...")
+    results = check_data(data_path)
+
+    if not all(results.values()):
+        failed_checks = [k for k, v in results.items() if not v]
+        logger.error(f"ERREUR: Data quality checks échoués: {failed_checks}")
+        raise RuntimeError(f"Data quality checks échoués: {failed_checks}. Entraînement annulé.")
+
+    logger.info("Données validées avec succès!")
+    return results
+
 @task
 def soft_validate_trained_model():
     """Vérifier la qualité du modèle APRÈS l'entraînement - VERSION SOUPLE"""
@@ -106,6 +124,16 @@ def soft_validate_trained_model():
         return None
 
 
+def stop_if_validation_failed(validation, wait=False):
+    """Récupérer le résultat de la validation lancée en parallèle.
+    Sans attente, ne fait rien tant qu'elle n'est pas terminée ; si elle a échoué, son exception interrompt le pipeline"""
+    if validation is None:
+        return None
+    if wait or validation.state.is_final():
+        return validation.result()
+    return None
+
+
 def check_model_exists() -> bool:
     """Vérifier si un modèle existe déjà dans MLflow"""
     try:
@@ -119,8 +147,9 @@ def check_model_exists() -> bool:
         return False
 
 
-@flow(name="Wine Quality Training Pipeline")
-def wine_quality_pipeline(data_url: str = "", DATA_PATH: str = DATA_PATH):
+@flow(name="Wine Quality Training Pipeline", task_runner=ThreadPoolTaskRunner(max_workers=4))
+def wine_quality_pipeline(data_url: str = "", DATA_PATH: str = DATA_PATH,
+                          concurrent_validation: bool = True, strict_validation: bool = False):
     """Pipeline d'entraînement du modèle Wine Quality"""
     try:
         logger = get_run_logger()
@@ -137,28 +166,53 @@ def wine_quality_pipeline(data_url: str = "", DATA_PATH: str = DATA_PATH):
         check_file_exists(DATA_PATH)
     
         # Validation des données
-        # Version SOUPLE :
+        # Version SOUPLE par défaut ; version BLOQUANTE (strict_validation) : un check échoué annule l'entraînement
+        validate = blocking_validate_input_data if strict_validation else soft_validate_input_data
     
-        soft_validate_input_data(DATA_PATH)
+        if concurrent_validation:
+            # Validation en parallèle du chargement/prétraitement, jointure avant l'entraînement
+            validation = validate.submit(DATA_PATH)
+        else:
+            validate(DATA_PATH)
+            validation = None
     
-        # Version STRICTE :
-        # validate_input_data(DATA_PATH)
+        # Chargement et préparation des données (réutilisés depuis le cache si le fichier n'a pas changé)
+        # Les tasks s'échangent des références vers des .npy, ouverts ensuite par memory-mapping
+        data_hash = compute_data_hash(DATA_PATH)
+        X_ref, y_ref, preprocessor = run_with_array_cache(preprocess_file, DATA_PATH, data_hash)
+        stop_if_validation_failed(validation)  # Mode strict : arrêt anticipé si la validation a déjà échoué
+        X_train_ref, X_test_ref, X_val_ref, y_train_ref, y_test_ref, y_val_ref = run_with_array_cache(train_test_split, X_ref, y_ref)
+        X_train, X_test, X_val = load_array(X_train_ref), load_array(X_test_ref), load_array(X_val_ref)
+        y_train, y_test, y_val = load_array(y_train_ref), load_array(y_test_ref), load_array(y_val_ref)
     
-        # Chargement et préparation des données
-        data = load_data(DATA_PATH)
-        X_processed, y_processed, preprocessor = preprocess_data(data)
-        X_train, X_test, X_val, y_train, y_test, y_val = train_test_split(X_processed, y_processed)
+        # Jointure : la validation doit être terminée avant tout entraînement (validation croisée comprise)
+        stop_if_validation_failed(validation, wait=True)
+    
+        # Validation croisée k-fold sur train + val (le test set reste de côté)
+        cv_metrics = cross_validate_model(
+            concat_arrays([X_train_ref, X_val_ref]),
+            concat_arrays([y_train_ref, y_val_ref])
+        )
     
         # Création et entraînement du modèle
         num_inputs = X_train.shape[1]
         input_shape = (num_inputs, )
         model = create_model(input_shape=input_shape)
-        model, model_info = train_and_log_model(model, X_train, y_train, X_val, y_val)
+        model, model_info = train_and_log_model(model, X_train, y_train, X_val, y_val, cv_metrics=cv_metrics)
     
         # Évaluation
         evaluation = evaluate_model(model, X_test, y_test)
         logger.info(f"Évaluation finale - Test loss: {evaluation}")
     
+        # Le modèle doit être enregistré avant de valider sa dernière version
+        model_version = wait_for_model_upload(model_info)
+    
+        if model_version is None:
+            # Sinon check_model validerait la version précédente, que ce run n'a pas produite
+            logger.error("ERREUR: Le modèle n'a pas pu être enregistré dans MLflow, validation du modèle ignorée")
+            return model, None
+        logger.info(f"Modèle enregistré: {MODEL_NAME} version {model_version}")
+    
         # Validation du modèle
         # Version SOUPLE :
         soft_validate_trained_model()
@@ -167,7 +221,7 @@ def wine_quality_pipeline(data_url: str = "", DATA_PATH: str = DATA_PATH):
         # validate_trained_model()
     
         logger.info("Pipeline complété avec succès!")
-        return model, model_info
+        return model, model_version
     finally:
         if data_url:
             delete_temp_file(DL_TEMP_FILENAME)